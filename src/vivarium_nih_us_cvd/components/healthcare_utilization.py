@@ -1,5 +1,6 @@
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Union
 
+import numpy as np
 import pandas as pd
 from vivarium import Component
 from vivarium.framework.engine import Builder
@@ -9,6 +10,12 @@ from vivarium.framework.population import SimulantData
 from vivarium_nih_us_cvd.components.treatment import Treatment
 from vivarium_nih_us_cvd.constants import data_keys, data_values, models
 
+# Visit types as an object array indexable by integer code
+VISIT_TYPES = np.array(data_values.VISIT_TYPE, dtype=object)
+VISIT_TYPE_CODES = {
+    visit_type: code for code, visit_type in enumerate(data_values.VISIT_TYPE)
+}
+
 
 class HealthcareUtilization(Component):
     """Manages healthcare utilization and scheduling of appointments."""
@@ -28,6 +35,7 @@ class HealthcareUtilization(Component):
     @property
     def columns_required(self) -> Optional[List[str]]:
         return [
+            "alive",
             "age",
             "sex",
             models.ISCHEMIC_STROKE_MODEL_NAME,
@@ -95,6 +103,9 @@ class HealthcareUtilization(Component):
         a scheduled followup visit 0-6 months out, uniformly distributed. All
         simulants initialized in an acute state should be scheduled a followup
         visit 3-6 months out, uniformly distributed.
+
+        FIXME: simulants who are only on SBP or LDL-C medication are currently
+        initialized with no scheduled followup (NaT) rather than one 0-6 months out.
         """
         event_time = self.clock() + self.step_size()
         pop = self.population_view.subview(
@@ -103,8 +114,6 @@ class HealthcareUtilization(Component):
                 "sex",
                 models.ISCHEMIC_STROKE_MODEL_NAME,
                 models.ISCHEMIC_HEART_DISEASE_AND_HEART_FAILURE_MODEL_NAME,
-                data_values.COLUMNS.SBP_MEDICATION,
-                data_values.COLUMNS.LDLC_MEDICATION,
             ]
         ).get(pop_data.index)
 
@@ -114,48 +123,43 @@ class HealthcareUtilization(Component):
 
         # Update simulants initialized in an emergency state
         mask_acute_is = (
-            pop[models.ISCHEMIC_STROKE_MODEL_NAME] == models.ACUTE_ISCHEMIC_STROKE_STATE_NAME
+            pop[models.ISCHEMIC_STROKE_MODEL_NAME].to_numpy()
+            == models.ACUTE_ISCHEMIC_STROKE_STATE_NAME
         )
         mask_acute_mi = (
-            pop[models.ISCHEMIC_HEART_DISEASE_AND_HEART_FAILURE_MODEL_NAME]
+            pop[models.ISCHEMIC_HEART_DISEASE_AND_HEART_FAILURE_MODEL_NAME].to_numpy()
             == models.ACUTE_MYOCARDIAL_INFARCTION_STATE_NAME
         )
-        emergency = pop[(mask_acute_is | mask_acute_mi)].index
-        pop.loc[emergency, data_values.COLUMNS.VISIT_TYPE] = data_values.VISIT_TYPE.EMERGENCY
+        mask_emergency = mask_acute_is | mask_acute_mi
+        pop.loc[
+            mask_emergency, data_values.COLUMNS.VISIT_TYPE
+        ] = data_values.VISIT_TYPE.EMERGENCY
 
         # Schedule followups
-        # On medication and/or Post/chronic state 0-6 months out
-        on_medication = pop[
-            (
-                pop[data_values.COLUMNS.SBP_MEDICATION]
-                != data_values.SBP_MEDICATION_LEVEL.NO_TREATMENT.DESCRIPTION
-            )
-            | (
-                pop[data_values.COLUMNS.LDLC_MEDICATION]
-                != data_values.LDLC_MEDICATION_LEVEL.NO_TREATMENT.DESCRIPTION
-            )
-        ].index
         mask_chronic_is = (
-            pop[models.ISCHEMIC_STROKE_MODEL_NAME]
+            pop[models.ISCHEMIC_STROKE_MODEL_NAME].to_numpy()
             == models.CHRONIC_ISCHEMIC_STROKE_STATE_NAME
         )
         mask_post_mi = (
-            pop[models.ISCHEMIC_HEART_DISEASE_AND_HEART_FAILURE_MODEL_NAME]
+            pop[models.ISCHEMIC_HEART_DISEASE_AND_HEART_FAILURE_MODEL_NAME].to_numpy()
             == models.POST_MYOCARDIAL_INFARCTION_STATE_NAME
         )
-        acute_history = pop[mask_chronic_is | mask_post_mi].index
+        mask_followup = mask_emergency | mask_chronic_is | mask_post_mi
+        # Post/chronic state 0-6 months out; emergency (acute) state 3-6 months out
+        min_followup = np.where(mask_emergency, data_values.FOLLOWUP_MIN, 0)
+        max_followup = np.where(
+            mask_emergency,
+            data_values.FOLLOWUP_MAX,
+            data_values.FOLLOWUP_MAX - data_values.FOLLOWUP_MIN,
+        )
+        # Draws are keyed by simulant, so all followups are drawn in one call
         pop.loc[
-            on_medication.union(acute_history), data_values.COLUMNS.SCHEDULED_VISIT_DATE
+            mask_followup, data_values.COLUMNS.SCHEDULED_VISIT_DATE
         ] = self.schedule_followup(
-            index=acute_history,
-            event_time=event_time,
-            min_followup=0,
-            max_followup=(data_values.FOLLOWUP_MAX - data_values.FOLLOWUP_MIN),
-        )
-        # Emergency (acute) state 3-6 months out
-        pop.loc[emergency, data_values.COLUMNS.SCHEDULED_VISIT_DATE] = self.schedule_followup(
-            index=emergency,
+            index=pop.index[mask_followup],
             event_time=event_time,
+            min_followup=min_followup[mask_followup],
+            max_followup=max_followup[mask_followup],
         )
 
         # Generate column for last FPG test date
@@ -203,58 +207,69 @@ class HealthcareUtilization(Component):
         followup and do not schedule a new one or another one.
         """
         event_time = event.time
-        pop = self.population_view.get(event.index, query='alive == "alive"')
-        pop[data_values.COLUMNS.VISIT_TYPE] = data_values.VISIT_TYPE.NONE
+        pop = self.population_view.get(event.index)
+        # Living simulants
+        pop = pop[pop["alive"].to_numpy() == "alive"]
+        # Collect visit types as codes and write the column once at the end
+        visit_type_codes = np.full(
+            len(pop), VISIT_TYPE_CODES[data_values.VISIT_TYPE.NONE], dtype=np.int8
+        )
+        # Scheduled dates as datetime64; NaT compares False against the event time
+        scheduled_dates = pop[data_values.COLUMNS.SCHEDULED_VISIT_DATE].to_numpy(copy=True)
+        event_time_64 = np.datetime64(event_time.value, "ns")
 
         # Emergency visits
         mask_acute_is = (
-            pop[models.ISCHEMIC_STROKE_MODEL_NAME] == models.ACUTE_ISCHEMIC_STROKE_STATE_NAME
+            pop[models.ISCHEMIC_STROKE_MODEL_NAME].to_numpy()
+            == models.ACUTE_ISCHEMIC_STROKE_STATE_NAME
         )
         mask_acute_mi = (
-            pop[models.ISCHEMIC_HEART_DISEASE_AND_HEART_FAILURE_MODEL_NAME]
+            pop[models.ISCHEMIC_HEART_DISEASE_AND_HEART_FAILURE_MODEL_NAME].to_numpy()
             == models.ACUTE_MYOCARDIAL_INFARCTION_STATE_NAME
         )
         mask_emergency = mask_acute_is | mask_acute_mi
-        visit_emergency = pop[mask_emergency].index
-        pop.loc[
-            visit_emergency, data_values.COLUMNS.VISIT_TYPE
-        ] = data_values.VISIT_TYPE.EMERGENCY
+        visit_type_codes[mask_emergency] = VISIT_TYPE_CODES[data_values.VISIT_TYPE.EMERGENCY]
 
         # Missed scheduled (non-emergency) visits (these do not get re-scheduled)
-        mask_scheduled_non_emergency = (
-            pop[data_values.COLUMNS.SCHEDULED_VISIT_DATE] <= event_time
-        ) & (~mask_emergency)
-        scheduled_non_emergency = pop[mask_scheduled_non_emergency].index
-        pop.loc[scheduled_non_emergency, data_values.COLUMNS.SCHEDULED_VISIT_DATE] = pd.NaT
-        visit_missed = scheduled_non_emergency[
+        mask_scheduled_non_emergency = (scheduled_dates <= event_time_64) & ~mask_emergency
+        scheduled_dates[mask_scheduled_non_emergency] = np.datetime64("NaT")
+        mask_missed = mask_scheduled_non_emergency.copy()
+        mask_missed[mask_scheduled_non_emergency] = (
             self.randomness.get_draw(
-                scheduled_non_emergency, additional_key="miss_scheduled_visits"
-            )
+                pop.index[mask_scheduled_non_emergency],
+                additional_key="miss_scheduled_visits",
+            ).to_numpy()
             <= data_values.MISS_SCHEDULED_VISIT_PROBABILITY
-        ]
-        pop.loc[visit_missed, data_values.COLUMNS.VISIT_TYPE] = data_values.VISIT_TYPE.MISSED
+        )
+        visit_type_codes[mask_missed] = VISIT_TYPE_CODES[data_values.VISIT_TYPE.MISSED]
 
         # Scheduled visits
-        visit_scheduled = scheduled_non_emergency.difference(visit_missed)
-        pop.loc[
-            visit_scheduled, data_values.COLUMNS.VISIT_TYPE
-        ] = data_values.VISIT_TYPE.SCHEDULED
+        mask_scheduled = mask_scheduled_non_emergency & ~mask_missed
+        visit_type_codes[mask_scheduled] = VISIT_TYPE_CODES[data_values.VISIT_TYPE.SCHEDULED]
 
         # Background visits (for those who did not go for another reason or miss their scheduled visit)
-        maybe_background = pop.index.difference(
-            visit_emergency.union(scheduled_non_emergency)
+        maybe_background_positions = np.flatnonzero(
+            ~(mask_emergency | mask_scheduled_non_emergency)
         )
+        maybe_background = pop.index[maybe_background_positions]
         utilization_rate = self.background_utilization_rate(maybe_background)
         visit_background = self.randomness.filter_for_rate(
             maybe_background, utilization_rate, additional_key="background_visits"
         )  # pd.Index
-        pop.loc[
-            visit_background, data_values.COLUMNS.VISIT_TYPE
-        ] = data_values.VISIT_TYPE.BACKGROUND
+        # Map the visitors back to positions in pop through the candidate subset
+        mask_background = np.zeros(len(pop), dtype=bool)
+        mask_background[
+            maybe_background_positions[maybe_background.get_indexer(visit_background)]
+        ] = True
+        visit_type_codes[mask_background] = VISIT_TYPE_CODES[
+            data_values.VISIT_TYPE.BACKGROUND
+        ]
+        pop[data_values.COLUMNS.VISIT_TYPE] = VISIT_TYPES[visit_type_codes]
 
         # Test FPG and enroll in lifestyle
-        all_visitors = visit_emergency.union(visit_scheduled).union(visit_background)
-        tested_simulants = self.test_fpg(pop_visitors=pop.loc[all_visitors])
+        mask_visitors = mask_emergency | mask_scheduled | mask_background
+        pop_visitors = pop[mask_visitors]
+        tested_simulants = self.test_fpg(pop_visitors=pop_visitors)
         newly_lifestyle_enrolled_simulants = self.determine_lifestyle_enrollment(
             tested_simulants=tested_simulants
         )
@@ -265,21 +280,18 @@ class HealthcareUtilization(Component):
         ] = self.clock()
 
         # Schedule followups
-        needs_followup_sbp = self.determine_followups_sbp(pop_visitors=pop.loc[all_visitors])
-        needs_followup_ldlc = self.determine_followups_ldlc(
-            pop_visitors=pop.loc[all_visitors]
-        )
+        mask_needs_followup = pop.index.isin(newly_lifestyle_enrolled_simulants)
+        mask_needs_followup[mask_visitors] |= self.determine_followups_sbp(
+            pop_visitors=pop_visitors
+        ) | self.determine_followups_ldlc(pop_visitors=pop_visitors)
         # Do not schedule a followup if one already exists
-        has_followup_already_scheduled = pop[
-            (pop[data_values.COLUMNS.SCHEDULED_VISIT_DATE] > event_time)
-        ].index
+        mask_has_followup_already_scheduled = scheduled_dates > event_time_64
 
-        to_schedule_followup = newly_lifestyle_enrolled_simulants.union(
-            (needs_followup_sbp.union(needs_followup_ldlc))
-        ).difference(has_followup_already_scheduled)
-        pop.loc[
-            to_schedule_followup, data_values.COLUMNS.SCHEDULED_VISIT_DATE
-        ] = self.schedule_followup(index=to_schedule_followup, event_time=event_time)
+        mask_to_schedule_followup = mask_needs_followup & ~mask_has_followup_already_scheduled
+        scheduled_dates[mask_to_schedule_followup] = self.schedule_followup(
+            index=pop.index[mask_to_schedule_followup], event_time=event_time
+        ).to_numpy()
+        pop[data_values.COLUMNS.SCHEDULED_VISIT_DATE] = scheduled_dates
 
         self.population_view.update(
             pop[
@@ -327,41 +339,46 @@ class HealthcareUtilization(Component):
 
         return tested_simulants
 
-    def determine_followups_sbp(self, pop_visitors: pd.DataFrame) -> pd.Index:
-        """Apply SBP treatment ramp logic to determine who gets scheduled a followup"""
-        visitors = pop_visitors.index
-        measured_sbp = self.treatment.get_measured_sbp(index=visitors)
-        visitors_high_sbp = visitors.intersection(
-            measured_sbp[measured_sbp >= data_values.SBP_THRESHOLD.LOW].index
-        )
-        visitors_on_sbp_medication = visitors.intersection(
-            pop_visitors[
-                pop_visitors[data_values.COLUMNS.SBP_MEDICATION]
-                != data_values.SBP_MEDICATION_LEVEL.NO_TREATMENT.DESCRIPTION
-            ].index
+    def determine_followups_sbp(self, pop_visitors: pd.DataFrame) -> np.ndarray:
+        """Apply SBP treatment ramp logic to determine who gets scheduled a followup.
+        Returns a boolean mask aligned with pop_visitors.
+        """
+        mask_on_sbp_medication = (
+            pop_visitors[data_values.COLUMNS.SBP_MEDICATION].to_numpy()
+            != data_values.SBP_MEDICATION_LEVEL.NO_TREATMENT.DESCRIPTION
         )
         # Schedule those on sbp medication or those not on sbp medication but have a high sbp
-        needs_followup = visitors_on_sbp_medication.union(visitors_high_sbp)
+        # (only measure sbp for those not already on medication)
+        needs_followup = mask_on_sbp_medication.copy()
+        mask_not_on_sbp_medication = ~mask_on_sbp_medication
+        measured_sbp = self.treatment.get_measured_sbp(
+            index=pop_visitors.index[mask_not_on_sbp_medication]
+        )
+        needs_followup[mask_not_on_sbp_medication] = (
+            measured_sbp.to_numpy() >= data_values.SBP_THRESHOLD.LOW
+        )
 
         return needs_followup
 
-    def determine_followups_ldlc(self, pop_visitors: pd.DataFrame) -> pd.Index:
-        """Apply LDL-C treatment ramp logic to determine who gets scheduled a followup"""
-        visitors = pop_visitors.index
+    def determine_followups_ldlc(self, pop_visitors: pd.DataFrame) -> np.ndarray:
+        """Apply LDL-C treatment ramp logic to determine who gets scheduled a followup.
+        Returns a boolean mask aligned with pop_visitors.
+        """
         ascvd = self.treatment.get_ascvd(pop_visitors=pop_visitors)
-        measured_ldlc = self.treatment.get_measured_ldlc(index=visitors)
-        visitors_high_ascvd = visitors.intersection(
-            ascvd[ascvd >= data_values.ASCVD_THRESHOLD.LOW].index
-        )
-        visitors_high_ldlc = visitors.intersection(
-            measured_ldlc[measured_ldlc >= data_values.LDLC_THRESHOLD.LOW].index
-        )
+        mask_high_ascvd = ascvd.to_numpy() >= data_values.ASCVD_THRESHOLD.LOW
 
         # Schedule those with high ldlc and high ASCVD
         # All simulants under these conditions get scheduled a followup in our LDL-C ramp
         # regardless of medication status or medical history, and all simulants who don't meet
         # both conditions do not get scheduled a followup
-        needs_followup = visitors_high_ascvd.intersection(visitors_high_ldlc)
+        # (only measure ldlc for those with a high ASCVD)
+        needs_followup = mask_high_ascvd.copy()
+        measured_ldlc = self.treatment.get_measured_ldlc(
+            index=pop_visitors.index[mask_high_ascvd]
+        )
+        needs_followup[mask_high_ascvd] = (
+            measured_ldlc.to_numpy() >= data_values.LDLC_THRESHOLD.LOW
+        )
 
         return needs_followup
 
@@ -383,16 +400,16 @@ class HealthcareUtilization(Component):
         self,
         index: pd.Index,
         event_time: pd.Timestamp,
-        min_followup: int = data_values.FOLLOWUP_MIN,
-        max_followup: int = data_values.FOLLOWUP_MAX,
+        min_followup: Union[int, np.ndarray] = data_values.FOLLOWUP_MIN,
+        max_followup: Union[int, np.ndarray] = data_values.FOLLOWUP_MAX,
     ) -> pd.Series:
-        """Schedules followup visits"""
-        random_time_delta = pd.to_timedelta(
-            pd.Series(min_followup, index=index)
-            + (pd.Series(max_followup, index=index) - pd.Series(min_followup, index=index))
-            * self.randomness.get_draw(
-                pd.Series(min_followup, index=index).index, additional_key="schedule_followup"
-            ),
-            unit="day",
-        )
-        return pd.Series(event_time + random_time_delta, index=index)
+        """Schedules followup visits. The followup bounds (in days) can also be
+        given per simulant as arrays aligned with index.
+        """
+        draws = self.randomness.get_draw(index, additional_key="schedule_followup")
+        followup_days = min_followup + (max_followup - min_followup) * draws.to_numpy()
+        # Followup times as integer nanoseconds since the epoch
+        followup_times = event_time.value + (
+            followup_days * pd.Timedelta(days=1).value
+        ).astype(np.int64)
+        return pd.Series(followup_times.view("datetime64[ns]"), index=index)
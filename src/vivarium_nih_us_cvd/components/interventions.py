@@ -6,22 +6,21 @@ from vivarium.framework.lookup import LookupTable
 from vivarium.framework.time import get_time_stamp
 from vivarium_public_health.treatment import LinearScaleUp as LinearScaleUp_
 
+# Unset scale-up dates fall back to the simulation start and end dates
+DEFAULT_SCALE_UP_DATES = {
+    endpoint_type: {
+        "year": f"{endpoint_type}_year",
+        "month": f"{endpoint_type}_month",
+        "day": f"{endpoint_type}_day",
+    }
+    for endpoint_type in ["start", "end"]
+}
+
 
 class LinearScaleUp(LinearScaleUp_):
     CONFIGURATION_DEFAULTS = {
         "treatment": {
-            "date": {
-                "start": {
-                    "year": "start_year",
-                    "month": "start_month",
-                    "day": "start_day",
-                },
-                "end": {
-                    "year": "end_year",
-                    "month": "end_month",
-                    "day": "end_day",
-                },
-            },
+            "date": DEFAULT_SCALE_UP_DATES,
             "value": {
                 "start": "data",
                 "end": "data",
@@ -38,9 +37,8 @@ class LinearScaleUp(LinearScaleUp_):
         endpoints = {}
         for endpoint_type in ["start", "end"]:
             if (
-                (scale_up_config[endpoint_type]["year"] == f"{endpoint_type}_year")
-                & (scale_up_config[endpoint_type]["month"] == f"{endpoint_type}_month")
-                & (scale_up_config[endpoint_type]["day"] == f"{endpoint_type}_day")
+                scale_up_config[endpoint_type].to_dict()
+                == DEFAULT_SCALE_UP_DATES[endpoint_type]
             ):
                 endpoint = get_time_stamp(builder.configuration.time[endpoint_type])
             else:
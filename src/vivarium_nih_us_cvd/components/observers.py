@@ -1,5 +1,7 @@
-from typing import Any, Dict, List, Optional, Set
+from functools import partial
+from typing import Any, Dict, Set, Tuple
 
+import numpy as np
 import pandas as pd
 from vivarium import Component
 from vivarium.framework.engine import Builder
@@ -11,6 +13,38 @@ from vivarium_public_health.utilities import EntityString, TargetString, to_year
 from vivarium_nih_us_cvd.components.effects import MEDIATOR_NAMES
 from vivarium_nih_us_cvd.constants import data_values
 
+# Every observation shares one pop_filter so the results context filters the
+# population once per stratification set rather than once per observer
+POP_FILTER = 'alive=="alive" and tracked==True'
+
+# Categories observed by CategoricalColumnObserver for each supported column
+CATEGORICAL_COLUMN_CATEGORIES = {
+    data_values.COLUMNS.SBP_MEDICATION: tuple(
+        level.DESCRIPTION for level in data_values.SBP_MEDICATION_LEVEL
+    ),
+    data_values.COLUMNS.LDLC_MEDICATION: tuple(
+        level.DESCRIPTION for level in data_values.LDLC_MEDICATION_LEVEL
+    ),
+    data_values.COLUMNS.OUTREACH: tuple(data_values.INTERVENTION_CATEGORY_MAPPING),
+    data_values.COLUMNS.POLYPILL: tuple(data_values.INTERVENTION_CATEGORY_MAPPING),
+}
+
+
+def _get_target_risks_and_mediators() -> Dict[str, Set[str]]:
+    """MEDIATOR_NAMES is a nested dict like {risk: {target: [mediators]}}.
+    Invert it to map each target (the second-level keys) to the risks (the
+    outer keys) and the mediator names (the child node lists) affecting it.
+    """
+    target_risks_and_mediators = {}
+    for risk, mediator_dict in MEDIATOR_NAMES.items():
+        for target, mediators in mediator_dict.items():
+            target_risks_and_mediators.setdefault(target, set()).update([risk, *mediators])
+    return target_risks_and_mediators
+
+
+# Risks and mediators affecting each target, observed by JointPAFObserver
+TARGET_RISKS_AND_MEDIATORS = _get_target_risks_and_mediators()
+
 
 class SimpleResultsStratifier(ResultsStratifier_):
     """Centralized component for handling results stratification.
@@ -27,8 +61,12 @@ class SimpleResultsStratifier(ResultsStratifier_):
     def get_age_bins(self, builder: Builder) -> pd.DataFrame:
         """Re-define youngest age bin to 5_to_24"""
         age_bins = super().get_age_bins(builder)
-        age_bins = age_bins[age_bins["age_start"] >= 25.0].reset_index(drop=True)
-        age_bins.loc[len(age_bins.index)] = [5.0, 25.0, "5_to_24"]
+        youngest_age_bin = pd.DataFrame(
+            {"age_start": [5.0], "age_end": [25.0], "age_group_name": ["5_to_24"]}
+        )
+        age_bins = pd.concat(
+            [youngest_age_bin, age_bins[age_bins["age_start"] >= 25.0]], ignore_index=True
+        )
 
         # FIXME: MIC-4083 simulants can age past 125
         max_age = age_bins["age_end"].max()
@@ -92,10 +130,6 @@ class ContinuousRiskObserver(Component):
             }
         }
 
-    @property
-    def columns_required(self) -> Optional[List[str]]:
-        return ["alive"]
-
     #####################
     # Lifecycle methods #
     #####################
@@ -105,15 +139,18 @@ class ContinuousRiskObserver(Component):
         self.risk = EntityString(risk)
 
     def setup(self, builder: Builder) -> None:
-        self.step_size = builder.time.step_size()
+        # The step size is fixed for the run so convert it to years once
+        self.step_size_in_years = to_years(builder.time.step_size()())
         self.config = builder.configuration.stratification[self.risk]
+        self.exposure_column = f"{self.risk.name}.exposure"
 
         builder.results.register_observation(
             name=f"total_exposure_time_risk_{self.risk.name}",
-            pop_filter='alive=="alive" and tracked==True',
+            pop_filter=POP_FILTER,
+            aggregator_sources=[self.exposure_column],
             aggregator=self.aggregate_state_person_time,
             requires_columns=["alive"],
-            requires_values=[f"{self.risk.name}.exposure"],
+            requires_values=[self.exposure_column],
             additional_stratifications=self.config.include,
             excluded_stratifications=self.config.exclude,
             when="collect_metrics",
@@ -124,7 +161,7 @@ class ContinuousRiskObserver(Component):
     ###############
 
     def aggregate_state_person_time(self, x: pd.DataFrame) -> float:
-        return sum(x[f"{self.risk.name}.exposure"]) * to_years(self.step_size())
+        return x[self.exposure_column].to_numpy().sum() * self.step_size_in_years
 
 
 class HealthcareVisitObserver(Component):
@@ -139,32 +176,32 @@ class HealthcareVisitObserver(Component):
         }
     }
 
-    ##############
-    # Properties #
-    ##############
-
-    @property
-    def columns_required(self) -> Optional[List[str]]:
-        return [data_values.COLUMNS.VISIT_TYPE]
-
     #####################
     # Lifecycle methods #
     #####################
 
     def setup(self, builder: Builder) -> None:
-        self.step_size = builder.time.step_size()
         self.config = builder.configuration.stratification["visits"]
 
         for visit_type in data_values.VISIT_TYPE:
             builder.results.register_observation(
                 name=f"healthcare_visits_{visit_type}",
-                pop_filter=f'alive=="alive" and tracked==True and visit_type=="{visit_type}"',
+                pop_filter=POP_FILTER,
+                aggregator_sources=[data_values.COLUMNS.VISIT_TYPE],
+                aggregator=partial(self.count_visits, visit_type=visit_type),
                 requires_columns=["alive", data_values.COLUMNS.VISIT_TYPE],
                 additional_stratifications=self.config.include,
                 excluded_stratifications=self.config.exclude,
                 when="collect_metrics",
             )
 
+    ###############
+    # Aggregators #
+    ###############
+
+    def count_visits(self, x: pd.DataFrame, visit_type: str) -> int:
+        return np.count_nonzero(x[data_values.COLUMNS.VISIT_TYPE].to_numpy() == visit_type)
+
 
 class CategoricalColumnObserver(Component):
     """Observes person-time of a categorical state table column"""
@@ -190,10 +227,6 @@ class CategoricalColumnObserver(Component):
             }
         }
 
-    @property
-    def columns_required(self) -> Optional[List[str]]:
-        return ["alive", self.column]
-
     #####################
     # Lifecycle methods #
     #####################
@@ -203,7 +236,7 @@ class CategoricalColumnObserver(Component):
         self.column = column
 
     def setup(self, builder: Builder) -> None:
-        self.step_size = builder.time.step_size()
+        self.step_size_in_years = to_years(builder.time.step_size()())
         self.config = builder.configuration.stratification[self.column]
         self.categories = self.get_categories()
 
@@ -217,34 +250,26 @@ class CategoricalColumnObserver(Component):
         for category in self.categories:
             builder.results.register_observation(
                 name=f"{self.column}_{category}_person_time",
-                pop_filter=f'alive=="alive" and tracked==True and {self.column}=="{category}"',
-                aggregator=self.calculate_categorical_person_time,
+                pop_filter=POP_FILTER,
+                aggregator_sources=[self.column],
+                aggregator=partial(self.calculate_categorical_person_time, category=category),
                 requires_columns=["alive", self.column],
                 additional_stratifications=self.config.include,
                 excluded_stratifications=self.config.exclude,
                 when="time_step__prepare",
             )
 
-    def get_categories(self) -> List[str]:
-        mapping = {
-            data_values.COLUMNS.SBP_MEDICATION: [
-                level.DESCRIPTION for level in data_values.SBP_MEDICATION_LEVEL
-            ],
-            data_values.COLUMNS.LDLC_MEDICATION: [
-                level.DESCRIPTION for level in data_values.LDLC_MEDICATION_LEVEL
-            ],
-            data_values.COLUMNS.OUTREACH: list(data_values.INTERVENTION_CATEGORY_MAPPING),
-            data_values.COLUMNS.POLYPILL: list(data_values.INTERVENTION_CATEGORY_MAPPING),
-        }
-
-        return mapping[self.column]
+    def get_categories(self) -> Tuple[str, ...]:
+        return CATEGORICAL_COLUMN_CATEGORIES[self.column]
 
     ###############
     # Aggregators #
     ###############
 
-    def calculate_categorical_person_time(self, x: pd.DataFrame) -> float:
-        return len(x) * to_years(self.step_size())
+    def calculate_categorical_person_time(self, x: pd.DataFrame, category: str) -> float:
+        return (
+            np.count_nonzero(x[self.column].to_numpy() == category) * self.step_size_in_years
+        )
 
 
 class LifestyleObserver(CategoricalColumnObserver):
@@ -261,7 +286,8 @@ class LifestyleObserver(CategoricalColumnObserver):
     def register_observations(self, builder: Builder) -> None:
         builder.results.register_observation(
             name=f"lifestyle_cat1_person_time",
-            pop_filter='alive=="alive" and tracked==True',
+            pop_filter=POP_FILTER,
+            aggregator_sources=[self.column],
             aggregator=self.calculate_exposed_lifestyle_person_time,
             requires_columns=["alive", self.column],
             additional_stratifications=self.config.include,
@@ -270,7 +296,8 @@ class LifestyleObserver(CategoricalColumnObserver):
         )
         builder.results.register_observation(
             name=f"lifestyle_cat2_person_time",
-            pop_filter='alive=="alive" and tracked==True',
+            pop_filter=POP_FILTER,
+            aggregator_sources=[self.column],
             aggregator=self.calculate_unexposed_lifestyle_person_time,
             requires_columns=["alive", self.column],
             additional_stratifications=self.config.include,
@@ -278,18 +305,20 @@ class LifestyleObserver(CategoricalColumnObserver):
             when="time_step__prepare",
         )
 
-    def get_categories(self) -> List[str]:
-        return ["cat1", "cat2"]
+    def get_categories(self) -> Tuple[str, ...]:
+        return ("cat1", "cat2")
 
     ###############
     # Aggregators #
     ###############
 
     def calculate_exposed_lifestyle_person_time(self, x: pd.DataFrame) -> float:
-        return sum(~(x["lifestyle"].isna())) * to_years(self.step_size())
+        # The lifestyle column holds enrollment dates, which are NaT until enrollment
+        unexposed = np.count_nonzero(pd.isna(x["lifestyle"].to_numpy()))
+        return (len(x) - unexposed) * self.step_size_in_years
 
     def calculate_unexposed_lifestyle_person_time(self, x: pd.DataFrame) -> float:
-        return sum(x["lifestyle"].isna()) * to_years(self.step_size())
+        return np.count_nonzero(pd.isna(x["lifestyle"].to_numpy())) * self.step_size_in_years
 
 
 class BinnedRiskObserver(Component):
@@ -316,10 +345,6 @@ class BinnedRiskObserver(Component):
             }
         }
 
-    @property
-    def columns_required(self) -> Optional[List[str]]:
-        return ["alive"]
-
     #####################
     # Lifecycle methods #
     #####################
@@ -329,70 +354,52 @@ class BinnedRiskObserver(Component):
         self.risk = EntityString(risk)
 
     def setup(self, builder: Builder) -> None:
-        self.step_size = builder.time.step_size()
+        self.step_size_in_years = to_years(builder.time.step_size()())
         self.config = builder.configuration.stratification[f"binned_{self.risk}"]
+        self.exposure_column = f"{self.risk.name}.exposure"
 
         try:
             thresholds = data_values.BINNED_OBSERVER_THRESHOLDS[self.risk.name]
-        except:
+        except KeyError as e:
             raise ValueError(
-                "Thresholds only defined for high_ldl_cholesterol and high_systolic_blood_pressure."
+                "Thresholds only defined for high_ldl_cholesterol and high_systolic_blood_pressure. "
                 f"You provided {self.risk}."
-            )
+            ) from e
 
-        builder.results.register_observation(
-            name=f"total_exposure_time_risk_{self.risk.name}_below_{thresholds[0]}",
-            pop_filter=(
-                'alive=="alive" and tracked==True and '
-                f"`{self.risk.name}.exposure`<{thresholds[0]}"
-            ),
-            aggregator=self.aggregate_state_person_time,
-            requires_columns=["alive"],
-            requires_values=[f"{self.risk.name}.exposure"],
-            additional_stratifications=self.config.include,
-            excluded_stratifications=self.config.exclude,
-            when="collect_metrics",
-        )
+        bins = [(f"below_{thresholds[0]}", -np.inf, thresholds[0])]
+        for lower, upper in zip(thresholds[:-1], thresholds[1:]):
+            bins.append((f"between_{lower}_and_{upper}", lower, upper))
+        bins.append((f"above_{thresholds[-1]}", thresholds[-1], np.inf))
 
-        for left_threshold_idx in range(0, len(thresholds) - 1):
+        # Each aggregator bins the exposure column itself
+        for bin_name, lower, upper in bins:
             builder.results.register_observation(
-                name=(
-                    f"total_exposure_time_risk_{self.risk.name}"
-                    f"_between_{thresholds[left_threshold_idx]}_and_{thresholds[left_threshold_idx+1]}"
-                ),
-                pop_filter=(
-                    'alive=="alive" and tracked==True and '
-                    f"`{self.risk.name}.exposure`>={thresholds[left_threshold_idx]} and "
-                    f"`{self.risk.name}.exposure`<{thresholds[left_threshold_idx+1]}"
+                name=f"total_exposure_time_risk_{self.risk.name}_{bin_name}",
+                pop_filter=POP_FILTER,
+                aggregator_sources=[self.exposure_column],
+                aggregator=partial(
+                    self.aggregate_state_person_time, lower=lower, upper=upper
                 ),
-                aggregator=self.aggregate_state_person_time,
                 requires_columns=["alive"],
-                requires_values=[f"{self.risk.name}.exposure"],
+                requires_values=[self.exposure_column],
                 additional_stratifications=self.config.include,
                 excluded_stratifications=self.config.exclude,
                 when="collect_metrics",
             )
 
-        builder.results.register_observation(
-            name=f"total_exposure_time_risk_{self.risk.name}_above_{thresholds[len(thresholds)-1]}",
-            pop_filter=(
-                'alive=="alive" and tracked==True and '
-                f"`{self.risk.name}.exposure`>={thresholds[len(thresholds)-1]}"
-            ),
-            aggregator=self.aggregate_state_person_time,
-            requires_columns=["alive"],
-            requires_values=[f"{self.risk.name}.exposure"],
-            additional_stratifications=self.config.include,
-            excluded_stratifications=self.config.exclude,
-            when="collect_metrics",
-        )
-
     ###############
     # Aggregators #
     ###############
 
-    def aggregate_state_person_time(self, x: pd.DataFrame) -> float:
-        return len(x) * to_years(self.step_size())
+    def aggregate_state_person_time(
+        self, x: pd.DataFrame, lower: float, upper: float
+    ) -> float:
+        """Person-time with exposure in [lower, upper)."""
+        exposure = x[self.exposure_column].to_numpy()
+        return (
+            np.count_nonzero((exposure >= lower) & (exposure < upper))
+            * self.step_size_in_years
+        )
 
 
 class JointPAFObserver(Component):
@@ -421,19 +428,7 @@ class JointPAFObserver(Component):
         self.risks_and_mediators = self._get_risks_and_mediators()
 
     def _get_risks_and_mediators(self) -> Set[str]:
-        """MEDIATOR_NAMES is a nested dict like {risk: {target: [mediators]}}.
-        For this instance target (the second-level keys), extract the
-        risks (the outer keys) and the mediator names (the child node lists).
-        """
-        risks = {
-            risk
-            for risk, mediator_dict in MEDIATOR_NAMES.items()
-            if self.target.name in mediator_dict.keys()
-        }
-        mediator_lists = [MEDIATOR_NAMES[risk][self.target.name] for risk in risks]
-        return risks.union(
-            {mediator for mediators in mediator_lists for mediator in mediators}
-        )
+        return set(TARGET_RISKS_AND_MEDIATORS.get(self.target.name, set()))
 
     def setup(self, builder: Builder) -> None:
         self.risk_effects = {
@@ -445,7 +440,7 @@ class JointPAFObserver(Component):
         config = builder.configuration.stratification[f"joint_paf_on_{self.target.name}"]
         builder.results.register_observation(
             name=f"joint_paf_on_{self.target}",
-            pop_filter='alive=="alive" and tracked==True',
+            pop_filter=POP_FILTER,
             aggregator=self.calculate_paf,
             requires_columns=["alive"],
             requires_values=[
@@ -458,8 +453,8 @@ class JointPAFObserver(Component):
 
     def calculate_paf(self, x: pd.DataFrame) -> float:
         joint_rrs = pd.Series(1.0, index=x.index)
-        for risk in self.risk_effects:
-            joint_rrs = self.risk_effects[risk].mediated_target_modifier(x.index, joint_rrs)
-        mean_rr = joint_rrs.mean()
+        for risk_effect in self.risk_effects.values():
+            joint_rrs = risk_effect.mediated_target_modifier(x.index, joint_rrs)
+        mean_rr = np.nanmean(joint_rrs.to_numpy())
         paf = (mean_rr - 1.0) / mean_rr
         return paf
@@ -41,7 +41,6 @@ class EvenlyDistributedPopulation(BasePopulation):
         population["age"] = np.linspace(
             age_start, age_end, num=len(population) + 1, endpoint=False
         )[1:]
-        population["sex"] = "Female"
-        population.loc[population.index % 2 == 1, "sex"] = "Male"
+        population["sex"] = np.where(population.index % 2 == 1, "Male", "Female")
         self.register_simulants(population[list(self.key_columns)])
         self.population_view.update(population)
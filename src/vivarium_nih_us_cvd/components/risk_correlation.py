@@ -48,7 +48,23 @@ class RiskCorrelation(Component):
 
         self.input_draw = builder.configuration.input_data.input_draw_number
         self.random_seed = builder.configuration.randomness.random_seed
-        self.correlation_data = pd.read_csv(paths.FILEPATHS.RISK_CORRELATION)
+        correlation = self.update_correlation_data(
+            pd.read_csv(paths.FILEPATHS.RISK_CORRELATION)
+        )
+        # The correlation data is fixed for the run, so lay out the age bands and
+        # the Cholesky factor of every band's covariance matrix once
+        self.age_bands = correlation[["age_start", "age_end"]].to_numpy()
+        covariance_columns = [
+            f"{first_risk.name}_AND_{second_risk.name}"
+            for first_risk in self.risks
+            for second_risk in self.risks
+        ]
+        covariance_matrices = (
+            correlation[covariance_columns]
+            .to_numpy(dtype=float)
+            .reshape(len(correlation), len(self.risks), len(self.risks))
+        )
+        self.cholesky_factors = np.linalg.cholesky(covariance_matrices)
 
     ########################
     # Event-driven methods #
@@ -56,32 +72,30 @@ class RiskCorrelation(Component):
 
     def on_initialize_simulants(self, pop_data: SimulantData) -> None:
         pop = self.population_view.subview(["age"]).get(pop_data.index)
-        propensities = pd.DataFrame(index=pop.index)
-
-        correlation = self.update_correlation_data(self.correlation_data)
-
-        for i in range(len(correlation)):
-            age_start = correlation.iloc[i]["age_start"]
-            age_end = correlation.iloc[i]["age_end"]
-
-            age_specific_pop = pop.query("age >= @age_start and age < @age_end")
-            covariance_matrix = [
-                [
-                    correlation.iloc[i][f"{first_risk.name}_AND_{second_risk.name}"]
-                    for second_risk in self.risks
-                ]
-                for first_risk in self.risks
-            ]
-
-            np.random.seed(get_hash(f"{self.input_draw}_{self.random_seed}"))
-            probit_propensity = np.random.multivariate_normal(
-                mean=[0] * len(self.risks), cov=covariance_matrix, size=len(age_specific_pop)
+        age = pop["age"].to_numpy()
+        # Simulants outside every age band are left without propensities
+        probit_propensities = np.full((len(pop), len(self.risks)), np.nan)
+        # Seed once so that each age band takes its own draws from the stream
+        rng = np.random.default_rng(get_hash(f"{self.input_draw}_{self.random_seed}"))
+
+        for (age_start, age_end), cholesky_factor in zip(
+            self.age_bands, self.cholesky_factors
+        ):
+            band = (age >= age_start) & (age < age_end)
+
+            # Correlate independent standard normal draws through the Cholesky
+            # factor of the band's covariance matrix
+            probit_propensities[band] = (
+                rng.standard_normal((np.count_nonzero(band), len(self.risks)))
+                @ cholesky_factor.T
             )
-            correlated_propensities = scipy.stats.norm().cdf(probit_propensity)
-            propensities.loc[
-                age_specific_pop.index, self.propensity_column_names
-            ] = correlated_propensities
 
+        correlated_propensities = scipy.special.ndtr(
+            probit_propensities, out=probit_propensities
+        )
+        propensities = pd.DataFrame(
+            correlated_propensities, index=pop.index, columns=self.propensity_column_names
+        )
         self.population_view.update(propensities)
 
     ##################
@@ -93,20 +107,23 @@ class RiskCorrelation(Component):
         of risk factor pairs switched. This makes creating the covariance matrix much cleaner.
         """
 
-        # risks are perfectly correlated with themselves
-        for risk in self.risks:
-            correlation_data[f"{risk.name}_AND_{risk.name}"] = 1
-
         # add columns with risk pairs switched in column name
         risk_pairs = [col for col in correlation_data.columns if "AND" in col]
         switched_risk_pairs = [
             pair.split("_AND_")[1] + "_AND_" + pair.split("_AND_")[0] for pair in risk_pairs
         ]
+        switched_correlations = correlation_data[risk_pairs].set_axis(
+            switched_risk_pairs, axis=1
+        )
 
-        for original_column, new_column in tuple(zip(risk_pairs, switched_risk_pairs)):
-            correlation_data[new_column] = correlation_data[original_column].values
+        # risks are perfectly correlated with themselves
+        self_correlations = pd.DataFrame(
+            1,
+            index=correlation_data.index,
+            columns=[f"{risk.name}_AND_{risk.name}" for risk in self.risks],
+        )
 
-        return correlation_data
+        return pd.concat([correlation_data, switched_correlations, self_correlations], axis=1)
 
 
 class JointPAF(Component):